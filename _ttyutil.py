@@ -0,0 +1,79 @@
+# _ttyutil.py -- terminal helpers shared by the pty bridge and driver scripts
+import fcntl
+import os
+import select
+import struct
+import termios
+import time
+
+CHUNK = 1 << 16  # bytes per read/recv/splice; a big SQL result needs few syscalls
+
+TIOCGWINSZ = getattr(termios, 'TIOCGWINSZ', 0x5413)
+TIOCSWINSZ = getattr(termios, 'TIOCSWINSZ', 0x5414)
+
+# struct winsize: rows, cols, xpixel, ypixel -- compiled once, not per SIGWINCH
+_WS = struct.Struct("HHHH")
+_WS_ZERO = _WS.pack(0, 0, 0, 0)
+
+
+def write_all(fd, data):
+    # fd may be nonblocking: wait for room instead of dropping the tail
+    view = memoryview(data)
+    while view:
+        try:
+            n = os.write(fd, view)
+        except BlockingIOError:
+            select.select([], [fd], [])
+            continue
+        view = view[n:]
+
+
+def writev_all(fd, chunks):
+    # One writev() for the whole batch; finish a short write chunk by chunk
+    try:
+        n = os.writev(fd, chunks)
+    except BlockingIOError:
+        n = 0
+    for chunk in chunks:
+        if n >= len(chunk):
+            n -= len(chunk)
+            continue
+        write_all(fd, memoryview(chunk)[n:])
+        n = 0
+
+
+def get_winsz(fd):
+    try:
+        return _WS.unpack(fcntl.ioctl(fd, TIOCGWINSZ, _WS_ZERO))
+    except Exception:
+        return 24, 80, 0, 0
+
+
+def set_winsz(fd, sz):
+    if not TIOCSWINSZ:
+        return
+    fcntl.ioctl(fd, TIOCSWINSZ, _WS.pack(*sz))
+
+
+def read_until(fd, prompt, timeout):
+    """Read from fd until prompt shows up; return everything before it."""
+    buf = bytearray()
+    start = 0
+    deadline = time.monotonic() + timeout
+    while True:
+        idx = buf.find(prompt, start)
+        if idx >= 0:
+            return bytes(buf[:idx])
+        # only rescan the tail that could hold a prompt split across reads
+        start = max(0, len(buf) - len(prompt) + 1)
+        wait = deadline - time.monotonic()
+        ready, _, _ = select.select([fd], [], [], max(wait, 0))
+        if not ready:
+            raise TimeoutError(f"timed out waiting for {prompt!r}")
+        try:
+            chunk = os.read(fd, CHUNK)
+        except OSError:
+            chunk = b""  # EIO -> slave side closed, REPL went away
+        if not chunk:
+            raise EOFError
+        buf += chunk
@@ -2,18 +2,19 @@
 import os
 import sys
 import pty
-import selectors
+import shlex
+import select
 import errno
 import stat
 import termios
 import tty
 import fcntl
-import struct
 import signal
 
+from _ttyutil import CHUNK, get_winsz, set_winsz, write_all, writev_all
+
 FIFO_PATH = os.environ.get("PYREPL_FIFO", "/tmp/pyrepl.in")
-TIOCGWINSZ = getattr(termios, 'TIOCGWINSZ', 0x5413)
-TIOCSWINSZ = getattr(termios, 'TIOCSWINSZ', 0x5414)
+DEFAULT_CMD = ["csql", "-Sudba", "testdb"]
 
 
 def ensure_fifo(path):
@@ -33,50 +34,62 @@ def open_fifo_rw(path):
 
 
 def reopen_fifo_reader(path):
-    while True:
-        try:
-            return os.open(path, os.O_RDONLY | os.O_NONBLOCK)
-        except OSError as e:
-            if e.errno in (errno.ENXIO, errno.ENOENT):
-                # No writer yet or race; try again shortly.
-                import time
-                time.sleep(0.05)
-                continue
-            raise
+    # A nonblocking reader open never waits for a writer, so this returns
+    # at once; recreate the FIFO first in case it was removed meanwhile.
+    ensure_fifo(path)
+    return os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+
+
+_saved_flags = {}  # fd -> status flags from before set_nonblocking() touched it
 
 
 def set_nonblocking(fd, enable=True):
-    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    flags = _saved_flags.get(fd)
+    if flags is None:
+        flags = fcntl.fcntl(fd, fcntl.F_GETFL)
     if enable:
+        _saved_flags[fd] = flags
         fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+    else:
+        _saved_flags.pop(fd, None)
         fcntl.fcntl(fd, fcntl.F_SETFL, flags & ~os.O_NONBLOCK)
 
 
-def get_winsz(fd):
-    try:
-        h, w, ph, pw = struct.unpack(
-            "HHHH", fcntl.ioctl(fd, TIOCGWINSZ, b"\0"*8))
-        return h, w, ph, pw
-    except Exception:
-        return 24, 80, 0, 0
-
+def splice_burst(src, dst):
+    # Move everything queued on src to dst without copying through userspace.
+    # Returns False once src hits EOF, True once it is drained.
+    while True:
+        try:
+            if not os.splice(src, dst, CHUNK, flags=os.SPLICE_F_NONBLOCK):
+                return False
+        except BlockingIOError:
+            # Either src is drained or dst is full; only the latter is worth a wait
+            if select.select([], [dst], [], 0)[1]:
+                return True
+            select.select([], [dst], [])
 
-def set_winsz(fd, sz):
-    if not TIOCSWINSZ:
-        return
-    h, w, ph, pw = sz
-    fcntl.ioctl(fd, TIOCSWINSZ, struct.pack("HHHH", h, w, ph, pw))
 
+def repl_cmd(argv):
+    # pyrepl.py [cmd ...]; falls back to $PYREPL_CMD, then csql
+    if argv:
+        return argv
+    env_cmd = os.environ.get("PYREPL_CMD")
+    return shlex.split(env_cmd) if env_cmd else DEFAULT_CMD
 
-def main():
-    ensure_fifo(FIFO_PATH)
 
+def spawn(cmd):
     pid, master_fd = pty.fork()
     if pid == 0:
-        # Child: attach to PTY as controlling tty and exec python
-        # os.execvp("python3", ["python3"])
-        os.execvp("csql", ["csql", "-Sudba", "testdb"])
+        # Child: attach to PTY as controlling tty and exec the REPL
+        os.execvp(cmd[0], cmd)
         raise SystemExit(1)
+    return pid, master_fd
+
+
+def main():
+    ensure_fifo(FIFO_PATH)
+
+    pid, master_fd = spawn(repl_cmd(sys.argv[1:]))
 
     # Parent: bridge FIFO -> PTY (stdin) and PTY -> stdout
     fifo_r, fifo_w_keepalive = open_fifo_rw(FIFO_PATH)
@@ -85,73 +98,158 @@ def main():
     old_tio = termios.tcgetattr(stdin_fd)
     tty.setraw(stdin_fd)
     set_nonblocking(stdin_fd, True)
+    os.set_blocking(master_fd, False)
 
     set_winsz(master_fd, get_winsz(stdin_fd))
 
-    def on_winch(signum, frame):
-        set_winsz(master_fd, get_winsz(stdin_fd))
-    signal.signal(signal.SIGWINCH, on_winch)
+    # Signals only write their number to a wakeup pipe; the real work runs
+    # in the event loop, outside of signal-handler context
+    sig_r, sig_w = os.pipe()
+    os.set_blocking(sig_r, False)
+    os.set_blocking(sig_w, False)
+    signal.set_wakeup_fd(sig_w, warn_on_full_buffer=False)
+    signal.signal(signal.SIGWINCH, lambda signum, frame: None)
+    signal.signal(signal.SIGINT, lambda signum, frame: None)
 
-    def on_sigint(signum, frame):
-        try:
-            os.kill(pid, signal.SIGINT)
-        except ProcessLookupError:
-            pass
-    signal.signal(signal.SIGINT, on_sigint)
+    ep = select.epoll()
+    ep.register(master_fd, select.EPOLLIN)
+    ep.register(fifo_r, select.EPOLLIN)
+    ep.register(stdin_fd, select.EPOLLIN)
+    ep.register(sig_r, select.EPOLLIN)
+
+    # Raw TTY: skip the BufferedWriter layer and write straight to the fd
+    stdout_fd = sys.stdout.fileno()
+    # PTY output lands here; allocated once instead of a bytes per read
+    out_view = memoryview(bytearray(CHUNK))
+    out_cap = len(out_view)
+    # FIFO -> PTY is spliced in-kernel, and so is PTY -> stdout when stdout
+    # is a pipe; either falls back to read/write if the kernel refuses
+    fifo_splice = True
+    out_splice = stat.S_ISFIFO(os.fstat(stdout_fd).st_mode)
+    # Input read in userspace, batched into one writev() to the PTY per wakeup
+    to_child = []
+    # Hot-path callables bound once, so the loop and handlers skip the
+    # module global + attribute lookups on every chunk
+    _read, _readv, _poll = os.read, os.readv, ep.poll
+    _EIO = errno.EIO
+    _queue = to_child.append
 
-    sel = selectors.DefaultSelector()
-    sel.register(master_fd, selectors.EVENT_READ, data="pty")
-    sel.register(fifo_r, selectors.EVENT_READ, data="fifo")
-    sel.register(stdin_fd, selectors.EVENT_READ, data="stdin")
+    # Handlers return True when the bridge should stop.
+    # Every source is drained until EAGAIN, so a single poll() wakeup
+    # covers a whole burst instead of a single read.
+    def handle_pty():
+        nonlocal out_splice
+        if out_splice:
+            try:
+                return not splice_burst(master_fd, stdout_fd)
+            except OSError as e:
+                if e.errno == _EIO:
+                    return True  # child exited
+                if e.errno != errno.EINVAL:
+                    raise
+                out_splice = False  # kernel can't splice out of a tty
+        # Drain the burst into the preallocated staging buffer,
+        # then write it out once
+        filled = 0
+        child_gone = False
+        while filled < out_cap:
+            try:
+                n = _readv(master_fd, [out_view[filled:]])
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno == _EIO:
+                    child_gone = True  # child exited
+                    break
+                raise
+            if not n:
+                child_gone = True
+                break
+            filled += n
+        if filled:
+            write_all(stdout_fd, out_view[:filled])
+        return child_gone
 
-    out = sys.stdout.buffer
+    def handle_fifo():
+        nonlocal fifo_r, fifo_splice
+        if fifo_splice:
+            try:
+                if splice_burst(fifo_r, master_fd):
+                    return False
+            except OSError as e:
+                if e.errno != errno.EINVAL:
+                    raise
+                fifo_splice = False  # PTY doesn't accept splice here
+                return handle_fifo()
+        else:
+            while True:
+                try:
+                    chunk = _read(fifo_r, CHUNK)
+                except BlockingIOError:
+                    return False
+                if not chunk:
+                    break
+                _queue(chunk)
+        # Writer closed; reopen reader to accept next writer
+        ep.unregister(fifo_r)
+        os.close(fifo_r)
+        del handlers[fifo_r]
+        fifo_r = reopen_fifo_reader(FIFO_PATH)
+        ep.register(fifo_r, select.EPOLLIN)
+        handlers[fifo_r] = handle_fifo
+        return False
+
+    def handle_stdin():
+        # keystrokes typed in this terminal; a paste can span several reads
+        while True:
+            try:
+                chunk = _read(stdin_fd, CHUNK)
+            except BlockingIOError:
+                return False
+            if not chunk:
+                return True  # stdin closed
+            _queue(chunk)
+
+    def handle_signals():
+        while True:
+            try:
+                signums = _read(sig_r, 512)
+            except BlockingIOError:
+                return False
+            if signal.SIGWINCH in signums:
+                set_winsz(master_fd, get_winsz(stdin_fd))
+            if signal.SIGINT in signums:
+                try:
+                    os.kill(pid, signal.SIGINT)
+                except ProcessLookupError:
+                    pass
+
+    handlers = {
+        master_fd: handle_pty,
+        fifo_r: handle_fifo,
+        stdin_fd: handle_stdin,
+        sig_r: handle_signals,
+    }
     try:
         while True:
-            for key, _ in sel.select():
-                src = key.data
-                if src == "pty":
-                    try:
-                        data = os.read(master_fd, 4096)
-                    except OSError as e:
-                        if e.errno == errno.EIO:
-                            return  # child exited
-                        raise
-                    if not data:
-                        return
-                    out.write(data)
-                    out.flush()
-
-                elif src == "fifo":
-                    try:
-                        chunk = os.read(fifo_r, 4096)
-                    except BlockingIOError:
-                        continue
-                    if not chunk:
-                        # Writer closed; reopen reader to accept next writer
-                        sel.unregister(fifo_r)
-                        os.close(fifo_r)
-                        fifo_r = reopen_fifo_reader(FIFO_PATH)
-                        sel.register(fifo_r, selectors.EVENT_READ, data="fifo")
-                        continue
-                    os.write(master_fd, chunk)
-                else:  # "stdin" -> keystrokes typed in this terminal
-                    try:
-                        chunk = os.read(stdin_fd, 4096)
-                    except BlockingIOError:
-                        continue
-                    if not chunk:
-                        return  # stdin closed
-                    os.write(master_fd, chunk)
+            stop = False
+            for fd, _ in _poll():
+                if handlers[fd]():
+                    stop = True
+            if to_child:
+                writev_all(master_fd, to_child)
+                to_child.clear()
+            if stop:
+                return
 
     finally:
         # Restore terminal and clean up
         try: termios.tcsetattr(stdin_fd, termios.TCSADRAIN, old_tio)
         except Exception: pass
         set_nonblocking(stdin_fd, False)
-        for fd in (master_fd, fifo_r, fifo_w_keepalive):
-            try: sel.unregister(fd)
-            except Exception: pass
-        for fd in (master_fd, fifo_r, fifo_w_keepalive):
+        signal.set_wakeup_fd(-1)
+        ep.close()
+        for fd in (master_fd, fifo_r, fifo_w_keepalive, sig_r, sig_w):
             try: os.close(fd)
             except Exception: pass
 
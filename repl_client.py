@@ -3,20 +3,23 @@
 import socket
 import sys
 
+from _ttyutil import CHUNK
+
 SOCK_PATH = "/tmp/repl_controller.sock"
 
 def send_cmd(cmd: str):
     with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        # big replies (SQL result sets) need fewer wakeups with a larger buffer
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
         s.connect(SOCK_PATH)
         # send command terminated by newline
         s.sendall((cmd + "\n").encode('utf-8'))
         # read reply (server sends one reply per connection)
-        data = b''
-        while True:
-            chunk = s.recv(4096)
-            if not chunk:
-                break
-            data += chunk
+        # recv_into() one reusable buffer instead of a new bytes per chunk
+        view = memoryview(bytearray(CHUNK))
+        data = bytearray()
+        while (n := s.recv_into(view)) > 0:
+            data += view[:n]
         return data.decode('utf-8')
 
 if __name__ == "__main__":
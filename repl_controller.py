@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 # repl_controller.py
 import os
+import pty
 import socket
-import pexpect
 import sys
+import termios
 import traceback
 
+from _ttyutil import CHUNK, read_until
+
 SOCK_PATH = "/tmp/repl_controller.sock"
 REPL_CMD = ["python3", "-i"]   # change to the REPL you want
+PROMPT = b">>> "
 
 def ensure_socket_removed():
     try:
@@ -17,42 +21,56 @@ def ensure_socket_removed():
 
 def start_repl():
     # spawn REPL in a pty so it behaves like an interactive terminal
-    child = pexpect.spawn(REPL_CMD[0], REPL_CMD[1:], encoding='utf-8', echo=False)
-    # wait for initial prompt
-    child.expect_exact('>>> ')
-    return child
+    pid, master_fd = pty.fork()
+    if pid == 0:
+        # Child: no echo on the slave, so replies don't carry the command back
+        attrs = termios.tcgetattr(0)
+        attrs[3] &= ~termios.ECHO
+        termios.tcsetattr(0, termios.TCSANOW, attrs)
+        os.execvp(REPL_CMD[0], REPL_CMD)
+        os._exit(1)
+    # wait for initial prompt; give up like pexpect's default 30 s timeout did
+    read_until(master_fd, PROMPT, timeout=30)
+    return pid, master_fd
 
-def handle_client(conn, child):
+def repl_alive(pid):
     try:
-        with conn:
-            # read until newline, strip trailing newline
-            data = conn.recv(65536).decode('utf-8')
+        return os.waitpid(pid, os.WNOHANG) == (0, 0)
+    except ChildProcessError:
+        return False
+
+def handle_client(conn, master_fd):
+    with conn:
+        try:
+            # read until newline (a long command may span several recv()s),
+            # strip trailing newline
+            data = bytearray()
+            while True:
+                chunk = conn.recv(CHUNK)
+                data += chunk
+                if not chunk or b"\n" in chunk:
+                    break
             if not data:
                 return
-            cmd = data.rstrip('\n')
+            cmd = bytes(data.rstrip(b'\n'))
             # send to REPL
-            child.sendline(cmd)
+            os.write(master_fd, cmd + b"\n")
             # wait for next prompt (this blocks until prompt appears or timeout)
-            child.expect_exact('>>> ', timeout=5)
-            # child.before is everything between our sendline and the prompt
-            output = child.before
-            # remove the command echo if present (pexpect/pty may echo the command)
-            # The REPL typically echoes the command we sent as a line; drop the first line if it matches
-            lines = output.splitlines()
-            if lines and lines[0].strip() == cmd:
-                lines = lines[1:]
-            reply = "\n".join(lines).rstrip("\n") + "\n"
-            conn.sendall(reply.encode('utf-8'))
-    except pexpect.EOF:
-        conn.sendall(b"<REPL exited>\n")
-    except Exception:
-        tb = traceback.format_exc()
-        conn.sendall(f"<controller error>\n{tb}\n".encode('utf-8'))
+            # everything between our command and the prompt is the output;
+            # echo is off on the slave, so the command itself isn't in it
+            output = read_until(master_fd, PROMPT, timeout=5)
+            reply = output.replace(b"\r\n", b"\n").rstrip(b"\n") + b"\n"
+            conn.sendall(reply)
+        except EOFError:
+            conn.sendall(b"<REPL exited>\n")
+        except Exception:
+            tb = traceback.format_exc()
+            conn.sendall(f"<controller error>\n{tb}\n".encode('utf-8'))
 
 def run_server():
     ensure_socket_removed()
-    child = start_repl()
-    print("REPL started (pid=%d). Listening on %s" % (child.pid, SOCK_PATH), file=sys.stderr)
+    pid, master_fd = start_repl()
+    print("REPL started (pid=%d). Listening on %s" % (pid, SOCK_PATH), file=sys.stderr)
     srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
     srv.bind(SOCK_PATH)
     srv.listen(4)
@@ -60,13 +78,14 @@ def run_server():
     try:
         while True:
             conn, _ = srv.accept()
-            handle_client(conn, child)
+            handle_client(conn, master_fd)
             # if child exited, break
-            if not child.isalive():
+            if not repl_alive(pid):
                 print("REPL exited.", file=sys.stderr)
                 break
     finally:
         srv.close()
+        os.close(master_fd)
         ensure_socket_removed()
 
 if __name__ == "__main__":
@@ -8,9 +8,10 @@ import socket
 import errno
 import fcntl
 import termios
-import struct
 import tty
 
+from _ttyutil import CHUNK, get_winsz, set_winsz, writev_all
+
 # --- Config ---
 REPL_CMD = [os.environ.get("REPL_BIN", "python3")]
 UDS_PATH = os.environ.get("REPL_UDS", "/tmp/repl.sock")
@@ -25,29 +26,13 @@ def set_nonblock(fd):
     fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
 
 
-def get_winsize(fd):
-    try:
-        s = struct.pack("HHHH", 0, 0, 0, 0)
-        r = fcntl.ioctl(fd, termios.TIOCGWINSZ, s)
-        rows, cols, _, _ = struct.unpack("HHHH", r)
-        return rows, cols
-    except Exception:
-        return 24, 80
-
-
-def set_winsize(fd, rows, cols):
-    s = struct.pack("HHHH", rows, cols, 0, 0)
-    try:
-        fcntl.ioctl(fd, termios.TIOCSWINSZ, s)
-    except Exception:
-        pass
-
-
 def forward_winsize(sig=None, frame=None):
     if master_fd is None:
         return
-    rows, cols = get_winsize(sys.stdin.fileno())
-    set_winsize(master_fd, rows, cols)
+    try:
+        set_winsz(master_fd, get_winsz(sys.stdin.fileno()))
+    except OSError:
+        pass
 
 
 def cleanup():
@@ -66,7 +51,7 @@ def accept(sock, mask):
 
 def read_client(conn, mask):
     try:
-        data = conn.recv(4096)
+        data = conn.recv(CHUNK)
     except ConnectionResetError:
         data = b""
     if not data:
@@ -89,7 +74,7 @@ def read_client(conn, mask):
 
 def read_stdin(fd, mask):
     try:
-        data = os.read(fd, 4096)
+        data = os.read(fd, CHUNK)
     except OSError as e:
         if e.errno == errno.EIO:
             data = b""
@@ -103,21 +88,36 @@ def read_stdin(fd, mask):
 
 
 def read_pty(fd, mask):
-    try:
-        data = os.read(fd, 4096)
-    except OSError as e:
-        # EIO → slave side closed (child exited)
-        if e.errno == errno.EIO:
-            data = b""
-        else:
-            raise
-    if not data:
-        # child exited
-        sel.unregister(fd)
-        # allow main loop to notice and exit
-        return
-    # Print REPL output to our stdout
-    os.write(sys.stdout.fileno(), data)
+    # Drain everything the child has queued, then print it with one writev()
+    chunks = []
+    while True:
+        try:
+            data = os.read(fd, CHUNK)
+        except BlockingIOError:
+            break
+        except OSError as e:
+            # EIO → slave side closed (child exited)
+            if e.errno == errno.EIO:
+                data = b""
+            else:
+                raise
+        if not data:
+            # child exited
+            sel.unregister(fd)
+            # allow main loop to notice and exit
+            break
+        chunks.append(data)
+    if chunks:
+        # Print REPL output to our stdout
+        writev_all(sys.stdout.fileno(), chunks)
+
+
+def reap_child(fd, mask):
+    # pidfd became readable → child exited; collect it and stop the loop
+    # (main() unregisters and closes the pidfd on the way out)
+    global child_pid
+    os.waitpid(child_pid, 0)
+    child_pid = None
 
 
 def install_tty_raw_if_tty():
@@ -186,6 +186,9 @@ def main():
     # Register event sources
     sel.register(srv, selectors.EVENT_READ, accept)
     sel.register(master_fd, selectors.EVENT_READ, read_pty)
+    # Child exit wakes the selector directly instead of polling waitpid()
+    pidfd = os.pidfd_open(child_pid)
+    sel.register(pidfd, selectors.EVENT_READ, reap_child)
     if sys.stdin.isatty() or not os.isatty(sys.stdin.fileno()):
         set_nonblock(sys.stdin.fileno())
         sel.register(sys.stdin.fileno(), selectors.EVENT_READ, read_stdin)
@@ -193,13 +196,8 @@ def main():
     try:
         install_tty_raw_if_tty()
         # Event loop
-        while True:
-            if child_pid is not None:
-                # poll if child exited
-                pid, status = os.waitpid(child_pid, os.WNOHANG)
-                if pid == child_pid:
-                    break
-            for key, mask in sel.select(timeout=0.2):
+        while child_pid is not None:
+            for key, mask in sel.select():
                 callback = key.data
                 callback(key.fileobj, mask)
     except KeyboardInterrupt:
@@ -217,6 +215,11 @@ def main():
         except Exception:
             pass
         os.close(master_fd)
+        try:
+            sel.unregister(pidfd)
+        except Exception:
+            pass
+        os.close(pidfd)
         try:
             sel.unregister(srv)
         except Exception: